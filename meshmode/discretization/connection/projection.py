@@ -20,14 +20,16 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 THE SOFTWARE.
 """
 
+from dataclasses import dataclass
+
 import numpy as np
 
-from pytools import keyed_memoize_method, memoize_in
+from pytools import keyed_memoize_method, memoize, memoize_in, memoize_method
 from pytools.obj_array import obj_array_vectorized_n_args
 
 import loopy as lp
 
-from meshmode.array_context import make_loopy_program
+from meshmode.array_context import FirstAxisIsElementsTag, make_loopy_program
 from meshmode.dof_array import DOFArray
 from meshmode.discretization.connection.direct import (
         DiscretizationConnection,
@@ -36,36 +38,593 @@ from meshmode.discretization.connection.chained import \
         ChainedDiscretizationConnection
 
 
-class L2ProjectionInverseDiscretizationConnection(DiscretizationConnection):
+# NOTE: contractions up to this length are unrolled in the projection kernels
+_MAX_UNROLL_SIZE = 32
+
+
+# {{{ differentiation matrices
+
+@memoize(key=lambda grp: grp.discretization_key())
+def _stacked_diff_matrices_by_key(grp):
+    from meshmode.discretization.poly_element import diff_matrices
+    result = np.stack(diff_matrices(grp))
+
+    # NOTE: the result is shared by all connections, so it must not be
+    # modified by any of them
+    result.setflags(write=False)
+    return result
+
+
+def _stacked_diff_matrices(grp):
+    """
+    :returns: the differentiation matrices of *grp*, stacked into an array
+        of shape ``(dim, nunit_dofs, nunit_dofs)``. The result is shared by
+        all groups with the same
+        :meth:`~meshmode.discretization.ElementGroupBase.discretization_key`,
+        e.g. by the groups at each level of a refinement hierarchy.
+    """
+
+    try:
+        return _stacked_diff_matrices_by_key(grp)
+    except NotImplementedError:
+        # NOTE: not all groups implement discretization_key, but
+        # diff_matrices is still memoized on the group itself
+        from meshmode.discretization.poly_element import diff_matrices
+        return np.stack(diff_matrices(grp))
+
+# }}}
+
+
+# {{{ determinants
+
+def _abs_det(jac):
+    """
+    :arg jac: an array of shape ``(dim, dim, nnodes)``.
+    :returns: the absolute value of the determinant of ``jac[:, :, i]``
+        for every node, as an array of shape ``(nnodes,)``.
+    """
+
+    dim = jac.shape[0]
+    if dim == 1:
+        det = jac[0, 0]
+    elif dim == 2:
+        det = jac[0, 0] * jac[1, 1] - jac[0, 1] * jac[1, 0]
+    elif dim == 3:
+        det = (
+                jac[0, 0] * (jac[1, 1] * jac[2, 2] - jac[1, 2] * jac[2, 1])
+                - jac[0, 1] * (jac[1, 0] * jac[2, 2] - jac[1, 2] * jac[2, 0])
+                + jac[0, 2] * (jac[1, 0] * jac[2, 1] - jac[1, 1] * jac[2, 0]))
+    else:
+        det = np.linalg.det(jac.transpose(2, 0, 1))
+
+    return np.abs(det)
+
+# }}}
+
+
+# {{{ kronecker product factorization
+
+def _kronecker_factors(mat, n_1d, dim):
+    """Factors *mat* into a Kronecker product of *dim* square matrices of
+    size *n_1d* using the nearest Kronecker product rearrangement of
+    Van Loan and Pitsianis.
+
+    :returns: a list of factors or *None* if *mat* is not (up to round-off)
+        a Kronecker product.
+    """
+
+    def factor(mat, dim):
+        if dim == 1:
+            return [mat]
+
+        n_rest = n_1d**(dim - 1)
+        rearranged = (mat
+                .reshape(n_1d, n_rest, n_1d, n_rest)
+                .transpose(0, 2, 1, 3)
+                .reshape(n_1d**2, n_rest**2))
+
+        u, sigma, vt = np.linalg.svd(rearranged, full_matrices=False)
+        return (
+                [(sigma[0] * u[:, 0]).reshape(n_1d, n_1d)]
+                + factor(vt[0].reshape(n_rest, n_rest), dim - 1))
+
+    if mat.shape != (n_1d**dim, n_1d**dim):
+        return None
+
+    factors = factor(mat, dim)
+
+    from functools import reduce
+    tol = 1.0e3 * np.finfo(mat.dtype).eps * np.max(np.abs(mat))
+    if not np.allclose(reduce(np.kron, factors), mat, rtol=0, atol=tol):
+        return None
+
+    return factors
+
+# }}}
+
+
+# {{{ projection batches
+
+@dataclass(frozen=True)
+class _ProjectionBatch:
+    """Host-side description of the operator applied to one batch of
+    elements by an L2 projection connection.
+
+    .. attribute:: from_group_index
+    .. attribute:: from_element_indices
+
+        A :class:`numpy.ndarray` of element indices in the group
+        :attr:`from_group_index` of the *from_discr* of the connection.
+
+    .. attribute:: to_element_indices
+
+        A :class:`numpy.ndarray` of element indices in the target group.
+
+    .. attribute:: matrix
+
+        A :class:`numpy.ndarray` of shape ``(n_to_nodes, n_from_nodes)``
+        that maps the data on each source element to its contribution on the
+        corresponding target element.
+    """
+
+    from_group_index: int
+    from_element_indices: np.ndarray
+    to_element_indices: np.ndarray
+    matrix: np.ndarray
+
+    @property
+    def nelements(self):
+        return len(self.from_element_indices)
+
+
+def _is_identity_indices(indices):
+    return np.array_equal(indices, np.arange(len(indices)))
+
+
+def _compose_projection_batches(first_batches, second_batches, discr):
+    """Composes the batches of two connections, where the connection with
+    *first_batches* is applied first, into batches that apply both at once.
+    *discr* is the intermediate discretization, i.e. the *to_discr* of the
+    first connection and the *from_discr* of the second.
+
+    Every target element of a batch in *first_batches* is assumed to appear
+    at most once in that batch, as is also required by the kernels in
+    :class:`_L2ProjectionConnectionBase`.
+    """
+
+    result = []
+    for second_grp_batches in second_batches:
+        grp_batches = []
+
+        for second in second_grp_batches:
+            for first in first_batches[second.from_group_index]:
+                # find the elements of the intermediate discretization written
+                # by *first* and read by *second*
+                lookup = np.full(
+                        discr.groups[second.from_group_index].nelements,
+                        -1, dtype=np.int64)
+                lookup[first.to_element_indices] = \
+                        np.arange(first.nelements)
+
+                first_iel = lookup[second.from_element_indices]
+                mask = first_iel >= 0
+                if not np.any(mask):
+                    continue
+
+                grp_batches.append(_ProjectionBatch(
+                    from_group_index=first.from_group_index,
+                    from_element_indices=(
+                        first.from_element_indices[first_iel[mask]]),
+                    to_element_indices=second.to_element_indices[mask],
+                    matrix=second.matrix @ first.matrix))
+
+        result.append(grp_batches)
+
+    return result
+
+# }}}
+
+
+# {{{ projection connections
+
+class _L2ProjectionConnectionBase(DiscretizationConnection):
+    """Applies the operators from :meth:`_projection_batches`, which
+    subclasses must provide.
+
+    .. attribute:: use_sum_factorization
+
+        If *True*, batches whose operators are Kronecker products are applied
+        by sum factorization, see :meth:`_batch_kronecker_factors`.
+    """
+
+    use_sum_factorization = False
+
+    def _projection_batches(self, actx):
+        """
+        :returns: a list with one entry per group in :attr:`to_discr`,
+            each of which is a list of :class:`_ProjectionBatch`.
+        """
+        raise NotImplementedError
+
+    @keyed_memoize_method(key=lambda actx, igrp, ibatch, dtype:
+            (igrp, ibatch, dtype))
+    def _batch_projection_matrix(self, actx, igrp, ibatch, dtype):
+        """
+        :arg dtype: the (real) type of the returned matrix, which should
+            match the precision of the data it is applied to.
+        """
+
+        batch = self._projection_batches(actx)[igrp][ibatch]
+        return actx.freeze(actx.from_numpy(batch.matrix.astype(dtype)))
+
+    @keyed_memoize_method(key=lambda actx, igrp, ibatch: (igrp, ibatch))
+    def _batch_element_indices(self, actx, igrp, ibatch):
+        """
+        :returns: a tuple ``(from_element_indices, to_element_indices)`` of
+            frozen arrays, where an entry is *None* if the indices are just
+            ``arange(nelements)``. These do not need to be passed to the
+            kernels, which avoids the corresponding indirect gather or
+            scatter and leaves the element axis contiguous. All other indices
+            are stored as :class:`numpy.int32`.
+        """
+
+        def freeze_non_identity(indices):
+            if _is_identity_indices(indices):
+                return None
+
+            return actx.freeze(actx.from_numpy(
+                indices.astype(np.int32, copy=False)))
+
+        batch = self._projection_batches(actx)[igrp][ibatch]
+        return (
+                freeze_non_identity(batch.from_element_indices),
+                freeze_non_identity(batch.to_element_indices))
+
+    @keyed_memoize_method(key=lambda actx, igrp, ibatch: (igrp, ibatch))
+    def _batch_kronecker_factors(self, actx, igrp, ibatch):
+        """If both groups involved in the batch are tensor product groups,
+        :meth:`_batch_projection_matrix` is usually a Kronecker product of
+        one-dimensional operators, which can be applied by sum factorization.
+
+        Will return *None* if no such factorization exists or if
+        :attr:`use_sum_factorization` is *False*, or a
+        :class:`numpy.ndarray` of shape ``(dim, n_1d, n_1d)`` containing the
+        factors, where the first factor acts on the slowest varying index.
+        """
+
+        from meshmode.discretization.poly_element import \
+                TensorProductElementGroupBase
+
+        batch = self._projection_batches(actx)[igrp][ibatch]
+        tgrp = self.to_discr.groups[igrp]
+        sgrp = self.from_discr.groups[batch.from_group_index]
+
+        # NOTE: sum factorization only reduces the operation count in 2D/3D
+        if not (self.use_sum_factorization
+                and isinstance(tgrp, TensorProductElementGroupBase)
+                and isinstance(sgrp, TensorProductElementGroupBase)
+                and tgrp.dim in (2, 3)):
+            return None
+
+        n_1d = tgrp.order + 1
+        factors = _kronecker_factors(batch.matrix, n_1d, tgrp.dim)
+        if factors is None:
+            return None
+
+        return np.stack(factors)
+
+    @keyed_memoize_method(key=lambda actx, igrp, ibatch, dtype:
+            (igrp, ibatch, dtype))
+    def _batch_projection_factors(self, actx, igrp, ibatch, dtype):
+        """
+        :arg dtype: the (real) type of the returned factors, which should
+            match the precision of the data they are applied to.
+        :returns: the factors from :meth:`_batch_kronecker_factors` as a
+            frozen array or *None*.
+        """
+
+        factors = self._batch_kronecker_factors(actx, igrp, ibatch)
+        if factors is None:
+            return None
+
+        return actx.freeze(actx.from_numpy(factors.astype(dtype)))
+
+    @keyed_memoize_method(key=lambda actx, igrp: igrp)
+    def _group_target_coverage(self, actx, igrp):
+        """
+        :returns: a tuple ``(is_disjoint, is_covering)``, where *is_disjoint*
+            is *True* if no element of the target group *igrp* is written by
+            more than one batch and *is_covering* is *True* if every element
+            is written by some batch.
+        """
+
+        nelements = self.to_discr.groups[igrp].nelements
+        counts = np.zeros(nelements, dtype=np.int64)
+        for batch in self._projection_batches(actx)[igrp]:
+            counts += np.bincount(batch.to_element_indices, minlength=nelements)
+
+        return bool(np.all(counts <= 1)), bool(np.all(counts >= 1))
+
+    @obj_array_vectorized_n_args
+    def __call__(self, ary):
+        if not isinstance(ary, DOFArray):
+            raise TypeError("non-array passed to discretization connection")
+
+        if ary.shape != (len(self.from_discr.groups),):
+            raise ValueError("invalid shape of incoming resampling data")
+
+        actx = ary.array_context
+
+        def element_index(name, is_identity):
+            return "iel" if is_identity else f"{name}[iel]"
+
+        def update(lhs, rhs, accumulate):
+            return f"{lhs} = {lhs} + {rhs}" if accumulate else f"{lhs} = {rhs}"
+
+        kernel_data = [
+                lp.GlobalArg("result", None,
+                    shape=("n_to_elements", "n_to_nodes"),
+                    offset=lp.auto),
+                lp.GlobalArg("ary", None,
+                    shape=("n_from_elements", "n_from_nodes"),
+                    offset=lp.auto),
+                lp.ValueArg("n_from_elements", np.int32),
+                lp.ValueArg("n_to_elements", np.int32),
+                lp.ValueArg("nelements", np.int32),
+                ]
+
+        @memoize_in(actx, (_L2ProjectionConnectionBase, "conn_projection_knl"))
+        def kproj(n_to_nodes, n_from_nodes,
+                from_is_identity, to_is_identity, accumulate):
+            from_iel = element_index("from_element_indices", from_is_identity)
+            to_iel = element_index("to_element_indices", to_is_identity)
+
+            knl = make_loopy_program(
+                """{[iel, idof, j]:
+                    0 <= iel < nelements and
+                    0 <= idof < n_to_nodes and
+                    0 <= j < n_from_nodes}""",
+                update(f"result[{to_iel}, idof]",
+                    f"sum(j, proj_mat[idof, j] * ary[{from_iel}, j])",
+                    accumulate),
+                kernel_data + ["..."],
+                name="conn_projection_knl")
+
+            # NOTE: the operators are small, so specializing the kernel to
+            # their sizes lets the compiler unroll the contraction
+            knl = lp.fix_parameters(knl,
+                    n_to_nodes=n_to_nodes, n_from_nodes=n_from_nodes)
+            if n_from_nodes <= _MAX_UNROLL_SIZE:
+                knl = lp.tag_inames(knl, {"j": "unr"})
+
+            return knl
+
+        @memoize_in(actx, (_L2ProjectionConnectionBase,
+            "conn_projection_sum_factorized_knl"))
+        def kproj_sum_factorized(dim, n_1d,
+                from_is_identity, to_is_identity, accumulate):
+            from_iel = element_index("from_element_indices", from_is_identity)
+            to_iel = element_index("to_element_indices", to_is_identity)
+
+            if dim == 2:
+                instructions = [
+                    f"""
+                    <> tmp1[j0, i1] = sum(j1, factors[1, i1, j1]
+                            * ary[{from_iel}, j0*n_1d + j1])
+                    """,
+                    update(f"result[{to_iel}, i0*n_1d + i1]",
+                        "sum(j0, factors[0, i0, j0] * tmp1[j0, i1])",
+                        accumulate)
+                    ]
+            elif dim == 3:
+                instructions = [
+                    f"""
+                    <> tmp2[j0, j1, i2] = sum(j2, factors[2, i2, j2]
+                            * ary[{from_iel}, (j0*n_1d + j1)*n_1d + j2])
+                    """,
+                    """
+                    <> tmp1[j0, i1, i2] = sum(j1, factors[1, i1, j1]
+                            * tmp2[j0, j1, i2])
+                    """,
+                    update(f"result[{to_iel}, (i0*n_1d + i1)*n_1d + i2]",
+                        "sum(j0, factors[0, i0, j0] * tmp1[j0, i1, i2])",
+                        accumulate)
+                    ]
+            else:
+                raise ValueError(f"unsupported dimension: {dim}")
+
+            inames = ", ".join(
+                    [f"i{iaxis}" for iaxis in range(dim)]
+                    + [f"j{iaxis}" for iaxis in range(dim)])
+
+            knl = make_loopy_program([
+                "{[iel]: 0 <= iel < nelements}",
+                f"{{[{inames}]: 0 <= {inames} < n_1d}}"
+                ],
+                instructions,
+                kernel_data + [
+                    lp.GlobalArg("factors", None,
+                        shape=(dim, "n_1d", "n_1d")),
+                    lp.ValueArg("n_1d", np.int32),
+                    "..."
+                    ],
+                name="conn_projection_sum_factorized_knl")
+
+            # NOTE: the per-element temporaries need a fixed size
+            knl = lp.fix_parameters(knl, n_1d=n_1d)
+            if n_1d <= _MAX_UNROLL_SIZE:
+                knl = lp.tag_inames(knl,
+                        {f"j{iaxis}": "unr" for iaxis in range(dim)})
+
+            return knl
+
+        # NOTE: the operators are kept in the same precision as the data, so
+        # that single precision inputs do not get promoted to double precision
+        entry_dtype = np.dtype(ary.entry_dtype)
+        if entry_dtype.kind in "fc":
+            op_dtype = np.finfo(entry_dtype).dtype
+        else:
+            op_dtype = self.to_discr.real_dtype
+
+        result = []
+        for igrp, batches in enumerate(self._projection_batches(actx)):
+            tgrp = self.to_discr.groups[igrp]
+            grp_result = None
+
+            # NOTE: if no element is written by more than one batch, the
+            # kernels can just assign their results and, if all elements are
+            # written, the result does not need to be zeroed out first
+            is_disjoint, is_covering = self._group_target_coverage(actx, igrp)
+
+            for ibatch, batch in enumerate(batches):
+                if batch.nelements == 0:
+                    continue
+
+                sgrp = self.from_discr.groups[batch.from_group_index]
+
+                from_element_indices, to_element_indices = \
+                        self._batch_element_indices(actx, igrp, ibatch)
+                from_is_identity = from_element_indices is None
+                to_is_identity = to_element_indices is None
+
+                factors = self._batch_projection_factors(
+                        actx, igrp, ibatch, op_dtype)
+
+                if (factors is None
+                        and from_is_identity and to_is_identity
+                        and batch.nelements == sgrp.nelements == tgrp.nelements):
+                    # NOTE: the batch maps the whole source group onto the
+                    # whole target group, so this is just a batched matmul
+                    contrib = actx.einsum("ij,ej->ei",
+                            self._batch_projection_matrix(
+                                actx, igrp, ibatch, op_dtype),
+                            ary[sgrp.index],
+                            tagged=(FirstAxisIsElementsTag(),))
+
+                    if grp_result is None:
+                        grp_result = contrib
+                    else:
+                        grp_result = grp_result + contrib
+
+                    continue
+
+                kwargs = {}
+                if not from_is_identity:
+                    kwargs["from_element_indices"] = from_element_indices
+                if not to_is_identity:
+                    kwargs["to_element_indices"] = to_element_indices
+
+                if factors is None:
+                    n_to_nodes, n_from_nodes = batch.matrix.shape
+                    knl = kproj(n_to_nodes, n_from_nodes,
+                            from_is_identity, to_is_identity,
+                            not is_disjoint)
+                    kwargs["proj_mat"] = self._batch_projection_matrix(
+                            actx, igrp, ibatch, op_dtype)
+                else:
+                    dim, n_1d, _ = factors.shape
+                    knl = kproj_sum_factorized(dim, n_1d,
+                            from_is_identity, to_is_identity,
+                            not is_disjoint)
+                    kwargs["factors"] = factors
+
+                if grp_result is None:
+                    if is_disjoint and is_covering:
+                        allocate = actx.empty
+                    else:
+                        allocate = actx.zeros
+
+                    grp_result = allocate(
+                            (tgrp.nelements, tgrp.nunit_dofs),
+                            dtype=ary.entry_dtype)
+
+                actx.call_loopy(knl,
+                        ary=ary[sgrp.index],
+                        result=grp_result,
+                        nelements=batch.nelements,
+                        **kwargs)
+
+            if grp_result is None:
+                grp_result = actx.zeros(
+                        (tgrp.nelements, tgrp.nunit_dofs),
+                        dtype=ary.entry_dtype)
+
+            result.append(grp_result)
+
+        return DOFArray(actx, tuple(result))
+
+
+class L2ProjectionInverseDiscretizationConnection(_L2ProjectionConnectionBase):
     """Creates an inverse :class:`DiscretizationConnection` from an existing
     connection to allow transporting from the original connection's
     *to_discr* to *from_discr*.
 
+    When given a sequence of connections (or a
+    :class:`~meshmode.discretization.connection.ChainedDiscretizationConnection`),
+    the result is a
+    :class:`~meshmode.discretization.connection.ChainedDiscretizationConnection`
+    in which the inverse connections of consecutive pairs are fused. The
+    fused connections are not instances of this class and do not have a
+    :attr:`conn`.
+
+    Fusing a pair composes every batch of one connection with every batch of
+    the other that shares elements with it, so the number of batches can grow
+    up to the product of the two batch counts, e.g. from 18 to 81 batches for
+    two levels of hexahedral refinement. The composed batches are therefore
+    only used if there are at most as many of them as in the two connections
+    together, in which case the pair is applied without an intermediate
+    :class:`~meshmode.dof_array.DOFArray`. Otherwise, the two connections are
+    applied one after the other.
+
+    Tensor product batches are only applied by sum factorization if
+    *use_sum_factorization* is *True*. The sum factorized kernels only
+    parallelize over elements, while the dense kernels also parallelize over
+    the nodes in each element, so this is not enabled by default.
+
     .. attribute:: from_discr
     .. attribute:: to_discr
     .. attribute:: is_surjective
+    .. attribute:: use_sum_factorization
 
     .. attribute:: conn
     .. automethod:: __call__
 
     """
 
-    def __new__(cls, connections, is_surjective=False):
+    def __new__(cls, connections, is_surjective=False,
+            use_sum_factorization=False):
         if isinstance(connections, DirectDiscretizationConnection):
             return DiscretizationConnection.__new__(cls)
         elif isinstance(connections, ChainedDiscretizationConnection):
             if len(connections.connections) == 0:
                 return connections
 
-            return cls(connections.connections, is_surjective=is_surjective)
+            return cls(connections.connections,
+                    is_surjective=is_surjective,
+                    use_sum_factorization=use_sum_factorization)
         else:
             conns = []
             for cnx in reversed(connections):
-                conns.append(cls(cnx, is_surjective=is_surjective))
-
-            return ChainedDiscretizationConnection(conns)
-
-    def __init__(self, conn, is_surjective=False):
+                conns.append(cls(cnx,
+                    is_surjective=is_surjective,
+                    use_sum_factorization=use_sum_factorization))
+
+            fused_conns = []
+            while conns:
+                cnx = conns.pop(0)
+                if (conns
+                        and isinstance(cnx, _L2ProjectionConnectionBase)
+                        and isinstance(conns[0], _L2ProjectionConnectionBase)
+                        and cnx.to_discr is conns[0].from_discr):
+                    cnx = _FusedL2ProjectionConnection(cnx, conns.pop(0),
+                            is_surjective=is_surjective)
+
+                fused_conns.append(cnx)
+
+            return ChainedDiscretizationConnection(fused_conns)
+
+    def __init__(self, conn, is_surjective=False,
+            use_sum_factorization=False):
         if conn.from_discr.dim != conn.to_discr.dim:
             raise RuntimeError("cannot transport from face to element")
 
@@ -73,13 +632,14 @@ class L2ProjectionInverseDiscretizationConnection(DiscretizationConnection):
             raise RuntimeError("`to_discr` must have an orthonormal basis")
 
         self.conn = conn
+        self.use_sum_factorization = use_sum_factorization
         super().__init__(
                 from_discr=self.conn.to_discr,
                 to_discr=self.conn.from_discr,
                 is_surjective=is_surjective)
 
-    @keyed_memoize_method(key=lambda actx: ())
-    def _batch_weights(self, actx):
+    @memoize_method
+    def _batch_weights(self):
         """Computes scaled quadrature weights for each interpolation batch in
         :attr:`conn`. The quadrature weights can be used to integrate over
         child elements in the domain of the parent element, by a change of
@@ -88,139 +648,136 @@ class L2ProjectionInverseDiscretizationConnection(DiscretizationConnection):
         :return: a dictionary with keys ``(group_id, batch_id)``.
         """
 
-        from pymbolic.geometric_algebra import MultiVector
-        from functools import reduce
-        from operator import xor
-
-        def det(v):
-            nnodes = v[0].shape[0]
-            det_v = np.empty(nnodes)
-
-            for i in range(nnodes):
-                outer_product = reduce(xor, [MultiVector(x[i, :].T) for x in v])
-                det_v[i] = abs((outer_product.I | outer_product).as_scalar())
-
-            return det_v
-
         weights = {}
-        jac = np.empty(self.to_discr.dim, dtype=object)
 
-        from meshmode.discretization.poly_element import diff_matrices
         for igrp, grp in enumerate(self.to_discr.groups):
-            matrices = diff_matrices(grp)
+            matrices = _stacked_diff_matrices(grp)
 
             for ibatch, batch in enumerate(self.conn.groups[igrp].batches):
-                for iaxis in range(grp.dim):
-                    jac[iaxis] = matrices[iaxis] @ batch.result_unit_nodes.T
+                # NOTE: jac[iaxis, jaxis, inode] is the derivative of the
+                # *jaxis* component of the mapped nodes along *iaxis*. The
+                # nodes are kept in the (dim, nnodes) layout of
+                # result_unit_nodes, so that the node axis stays contiguous
+                jac = np.einsum("ain,jn->aji",
+                        matrices[:grp.dim], batch.result_unit_nodes)
 
-                weights[igrp, ibatch] = actx.freeze(actx.from_numpy(
-                    det(jac) * grp.weights))
+                weights[igrp, ibatch] = _abs_det(jac) * grp.weights
 
         return weights
 
-    @obj_array_vectorized_n_args
-    def __call__(self, ary):
-        if not isinstance(ary, DOFArray):
-            raise TypeError("non-array passed to discretization connection")
+    @memoize_method
+    def _batch_tabulations(self, igrp, ibatch):
+        """Tabulates the basis functions of the source group at the
+        ``result_unit_nodes`` of the batch *ibatch* in group *igrp* of
+        :attr:`conn`. The tabulation is scaled by the quadrature weights from
+        :meth:`_batch_weights`, so that its rows can be directly used to
+        compute the projection onto each basis function.
 
-        if ary.shape != (len(self.from_discr.groups),):
-            raise ValueError("invalid shape of incoming resampling data")
+        :return: an array of shape ``(nbasis, nnodes)``.
+        """
 
-        actx = ary.array_context
+        batch = self.conn.groups[igrp].batches[ibatch]
+        sgrp = self.from_discr.groups[batch.from_group_index]
 
-        @memoize_in(actx, (L2ProjectionInverseDiscretizationConnection,
-            "conn_projection_knl"))
-        def kproj():
-            return make_loopy_program([
-                "{[iel]: 0 <= iel < nelements}",
-                "{[idof_quad]: 0 <= idof_quad < n_from_nodes}"
-                ],
-                """
-                for iel
-                    <> element_dot = sum(idof_quad,
-                                ary[from_element_indices[iel], idof_quad]
-                                * basis[idof_quad] * weights[idof_quad])
-
-                    result[to_element_indices[iel], ibasis] = \
-                            result[to_element_indices[iel], ibasis] + element_dot
-                end
-                """,
-                [
-                    lp.GlobalArg("ary", None,
-                        shape=("n_from_elements", "n_from_nodes")),
-                    lp.GlobalArg("result", None,
-                        shape=("n_to_elements", "n_to_nodes")),
-                    lp.GlobalArg("basis", None,
-                        shape="n_from_nodes"),
-                    lp.GlobalArg("weights", None,
-                        shape="n_from_nodes"),
-                    lp.ValueArg("n_from_elements", np.int32),
-                    lp.ValueArg("n_to_elements", np.int32),
-                    lp.ValueArg("n_to_nodes", np.int32),
-                    lp.ValueArg("ibasis", np.int32),
-                    "..."
-                    ],
-                name="conn_projection_knl")
+        tabulations = np.array([
+            basis_fn(batch.result_unit_nodes).flatten()
+            for basis_fn in sgrp.basis_obj().functions
+            ])
 
-        @memoize_in(actx, (L2ProjectionInverseDiscretizationConnection,
-            "conn_evaluation_knl"))
-        def keval():
-            return make_loopy_program([
-                "{[iel]: 0 <= iel < nelements}",
-                "{[idof]: 0 <= idof < n_to_nodes}",
-                "{[ibasis]: 0 <= ibasis < n_to_nodes}"
-                ],
-                """
-                    result[iel, idof] = result[iel, idof] + \
-                        sum(ibasis, vdm[idof, ibasis] * coefficients[iel, ibasis])
-                """,
-                [
-                    lp.GlobalArg("coefficients", None,
-                        shape=("nelements", "n_to_nodes")),
-                    "..."
-                    ],
-                name="conn_evaluate_knl")
+        return tabulations * self._batch_weights()[igrp, ibatch]
 
-        # compute weights on each refinement of the reference element
-        weights = self._batch_weights(actx)
+    @memoize_method
+    def _vandermonde_matrix(self, igrp):
+        grp = self.to_discr.groups[igrp]
 
-        # perform dot product (on reference element) to get basis coefficients
-        c = self.to_discr.zeros(actx, dtype=ary.entry_dtype)
+        from modepy import vandermonde
+        return vandermonde(grp.basis_obj().functions, grp.unit_nodes)
 
-        for igrp, cgrp in enumerate(self.conn.groups):
-            for ibatch, batch in enumerate(cgrp.batches):
-                sgrp = self.from_discr.groups[batch.from_group_index]
+    @keyed_memoize_method(key=lambda actx: ())
+    def _projection_batches(self, actx):
+        """Assembles the operators that project the data of each batch in
+        :attr:`conn` onto the basis of the target group and evaluate the
+        result at its unit nodes. The projection onto the modal coefficients
+        and the evaluation by the Vandermonde matrix are linear, so they are
+        folded into a single matrix per batch.
+        """
 
-                for ibasis, basis_fn in enumerate(sgrp.basis_obj().functions):
-                    basis = actx.from_numpy(
-                            basis_fn(batch.result_unit_nodes).flatten())
-
-                    # NOTE: batch.*_element_indices are reversed here because
-                    # they are from the original forward connection, but
-                    # we are going in reverse here. a bit confusing, but
-                    # saves on recreating the connection groups and batches.
-                    actx.call_loopy(kproj(),
-                            ibasis=ibasis,
-                            ary=ary[sgrp.index],
-                            basis=basis,
-                            weights=weights[igrp, ibatch],
-                            result=c[igrp],
-                            from_element_indices=batch.to_element_indices,
-                            to_element_indices=batch.from_element_indices)
-
-        # evaluate at unit_nodes to get the vector on to_discr
-        result = self.to_discr.zeros(actx, dtype=ary.entry_dtype)
-        for grp in self.to_discr.groups:
-            from modepy import vandermonde
-            vdm = actx.from_numpy(vandermonde(grp.basis_obj().functions,
-                                              grp.unit_nodes))
-            actx.call_loopy(
-                    keval(),
-                    result=result[grp.index],
-                    vdm=vdm,
-                    coefficients=c[grp.index])
+        result = []
+        for igrp, cgrp in enumerate(self.conn.groups):
+            vdm = self._vandermonde_matrix(igrp)
+
+            # NOTE: batch.*_element_indices are reversed here because
+            # they are from the original forward connection, but
+            # we are going in reverse here. a bit confusing, but
+            # saves on recreating the connection groups and batches.
+            result.append([
+                _ProjectionBatch(
+                    from_group_index=batch.from_group_index,
+                    from_element_indices=actx.to_numpy(
+                        actx.thaw(batch.to_element_indices)),
+                    to_element_indices=actx.to_numpy(
+                        actx.thaw(batch.from_element_indices)),
+                    matrix=vdm @ self._batch_tabulations(igrp, ibatch))
+                for ibatch, batch in enumerate(cgrp.batches)
+                ])
 
         return result
 
 
+class _FusedL2ProjectionConnection(_L2ProjectionConnectionBase):
+    """Applies *first* and then *second*, both of which are
+    :class:`_L2ProjectionConnectionBase` instances, in a single pass if that
+    does not require more batches than applying them one after the other.
+    """
+
+    def __init__(self, first, second, is_surjective=False):
+        if first.to_discr is not second.from_discr:
+            raise ValueError("connections cannot be composed")
+
+        self.first = first
+        self.second = second
+        self.use_sum_factorization = (
+                first.use_sum_factorization and second.use_sum_factorization)
+        super().__init__(
+                from_discr=first.from_discr,
+                to_discr=second.to_discr,
+                is_surjective=is_surjective)
+
+    @keyed_memoize_method(key=lambda actx: ())
+    def _projection_batches(self, actx):
+        return _compose_projection_batches(
+                self.first._projection_batches(actx),
+                self.second._projection_batches(actx),
+                self.first.to_discr)
+
+    @keyed_memoize_method(key=lambda actx: ())
+    def _use_composed_batches(self, actx):
+        """
+        :returns: *True* if applying the composed batches from
+            :meth:`_projection_batches` needs at most as many kernel launches
+            as applying :attr:`first` and :attr:`second` separately.
+        """
+
+        def nbatches(conn):
+            return sum(
+                    1
+                    for batches in conn._projection_batches(actx)
+                    for batch in batches
+                    if batch.nelements > 0)
+
+        return nbatches(self) <= nbatches(self.first) + nbatches(self.second)
+
+    @obj_array_vectorized_n_args
+    def __call__(self, ary):
+        if not isinstance(ary, DOFArray):
+            raise TypeError("non-array passed to discretization connection")
+
+        if self._use_composed_batches(ary.array_context):
+            return super().__call__(ary)
+
+        return self.second(self.first(ary))
+
+# }}}
+
+
 # vim: foldmethod=marker
@@ -80,11 +80,35 @@ def create_discretization(actx, ndim,
     return discr
 
 
-def create_refined_connection(actx, discr, threshold=0.3):
+def create_tensor_product_discretization(actx, ndim,
+                                         nelements=8,
+                                         order=4):
+    from meshmode.mesh import TensorProductElementGroup
+    from meshmode.mesh.generation import generate_regular_rect_mesh
+    mesh = generate_regular_rect_mesh(
+            a=(-0.5,)*ndim, b=(0.5,)*ndim,
+            nelements_per_axis=(nelements,)*ndim,
+            order=order,
+            group_cls=TensorProductElementGroup)
+
+    from meshmode.discretization import Discretization
+    from meshmode.discretization.poly_element import \
+            GaussLegendreTensorProductGroupFactory
+    discr = Discretization(actx, mesh,
+            GaussLegendreTensorProductGroupFactory(order))
+
+    return discr
+
+
+def create_refined_connection(actx, discr, threshold=0.3,
+                              group_factory_cls=None):
     from meshmode.mesh.refinement import RefinerWithoutAdjacency
     from meshmode.discretization.connection import make_refinement_connection
-    from meshmode.discretization.poly_element import \
-            InterpolatoryQuadratureSimplexGroupFactory
+
+    if group_factory_cls is None:
+        from meshmode.discretization.poly_element import \
+                InterpolatoryQuadratureSimplexGroupFactory
+        group_factory_cls = InterpolatoryQuadratureSimplexGroupFactory
 
     flags = np.random.rand(discr.mesh.nelements) < threshold
     refiner = RefinerWithoutAdjacency(discr.mesh)
@@ -92,7 +116,7 @@ def create_refined_connection(actx, discr, threshold=0.3):
 
     discr_order = discr.groups[0].order
     connection = make_refinement_connection(actx, refiner, discr,
-            InterpolatoryQuadratureSimplexGroupFactory(discr_order))
+            group_factory_cls(discr_order))
 
     return connection
 
@@ -112,6 +136,27 @@ def create_face_connection(actx, discr):
     return connection
 
 
+def project_on_host(actx, conn, ary):
+    """Applies the operators of the L2 projection connection *conn* to *ary*
+    on the host, accumulating into a zero-initialized result.
+    """
+
+    result = []
+    for igrp, batches in enumerate(conn._projection_batches(actx)):
+        tgrp = conn.to_discr.groups[igrp]
+        grp_result = np.zeros((tgrp.nelements, tgrp.nunit_dofs),
+                dtype=ary.entry_dtype)
+
+        for batch in batches:
+            grp_ary = actx.to_numpy(ary[batch.from_group_index])
+            np.add.at(grp_result, batch.to_element_indices,
+                    grp_ary[batch.from_element_indices] @ batch.matrix.T)
+
+        result.append(grp_result)
+
+    return result
+
+
 @pytest.mark.skip(reason="implementation detail")
 @pytest.mark.parametrize("ndim", [2, 3])
 def test_chained_batch_table(actx_factory, ndim, visualize=False):
@@ -398,6 +443,307 @@ def test_reversed_chained_connection(actx_factory, ndim, mesh_name):
     assert eoc.order_estimate() > (order + 1 - 0.5)
 
 
+@pytest.mark.parametrize(("ndim", "mesh_name"), [
+    (2, "starfish"),
+    (3, "torus")])
+def test_reversed_chained_connection_fusion(actx_factory, ndim, mesh_name):
+    actx = actx_factory()
+
+    discr = create_discretization(actx, ndim,
+            nelements=32 if ndim == 2 else 8,
+            mesh_name=mesh_name)
+
+    connections = []
+    conn = create_refined_connection(actx, discr, threshold=0.5)
+    connections.append(conn)
+    conn = create_refined_connection(actx, conn.to_discr, threshold=0.5)
+    connections.append(conn)
+
+    from meshmode.discretization.connection import (
+            ChainedDiscretizationConnection,
+            L2ProjectionInverseDiscretizationConnection)
+    from meshmode.discretization.connection.projection import (
+            _L2ProjectionConnectionBase, _FusedL2ProjectionConnection)
+
+    fused = L2ProjectionInverseDiscretizationConnection(
+            ChainedDiscretizationConnection(connections))
+    assert len(fused.connections) == 1
+    fused_cnx, = fused.connections
+    assert isinstance(fused_cnx, _FusedL2ProjectionConnection)
+
+    unfused = ChainedDiscretizationConnection([
+        L2ProjectionInverseDiscretizationConnection(cnx)
+        for cnx in reversed(connections)
+        ])
+
+    to_nodes = thaw(actx, conn.to_discr.nodes())
+    to_x = 0
+    for d in range(ndim):
+        to_x += actx.np.cos(to_nodes[d]) ** (d + 1)
+
+    unfused_x = unfused(to_x)
+
+    # NOTE: the composed batches are only used if there are few enough of
+    # them, so they are also applied directly to check the composition
+    for fused_x in [
+            fused(to_x),
+            _L2ProjectionConnectionBase.__call__(fused_cnx, to_x)]:
+        error = (
+                actx.np.linalg.norm(fused_x - unfused_x, np.inf)
+                / actx.np.linalg.norm(unfused_x, np.inf))
+        assert error < 1.0e-13
+
+
+def test_reversed_same_mesh_connection(actx_factory):
+    actx = actx_factory()
+
+    from meshmode.discretization import Discretization
+    from meshmode.discretization.poly_element import \
+            GaussLegendreTensorProductGroupFactory
+    from meshmode.discretization.connection import (
+            InterpolationBatch,
+            DiscretizationConnectionElementGroup,
+            DirectDiscretizationConnection,
+            make_same_mesh_connection,
+            L2ProjectionInverseDiscretizationConnection)
+    from meshmode.dof_array import DOFArray
+
+    order = 3
+    from_discr = create_tensor_product_discretization(actx, 2,
+            nelements=4, order=order)
+    to_discr = Discretization(actx, from_discr.mesh,
+            GaussLegendreTensorProductGroupFactory(order))
+
+    # NOTE: the Gauss-Legendre quadrature integrates the mass matrix exactly,
+    # so the projection between the two discretizations is the identity
+    conn = make_same_mesh_connection(actx, to_discr, from_discr)
+    reverse = L2ProjectionInverseDiscretizationConnection(conn)
+
+    # NOTE: the batch covers the whole group, so it is applied by einsum
+    assert reverse._batch_projection_factors(actx, 0, 0, np.float64) is None
+    assert reverse._batch_element_indices(actx, 0, 0) == (None, None)
+
+    x = DOFArray(actx, tuple(
+        actx.from_numpy(np.random.rand(grp.nelements, grp.nunit_dofs))
+        for grp in reverse.from_discr.groups))
+
+    error = (
+            actx.np.linalg.norm(reverse(x) - x, np.inf)
+            / actx.np.linalg.norm(x, np.inf))
+    assert error < 1.0e-12
+
+    # add a second batch, which is accumulated into the result of the einsum
+    def to_device(indices):
+        return actx.freeze(actx.from_numpy(indices))
+
+    all_elements = np.arange(from_discr.groups[0].nelements, dtype=np.intp)
+    some_elements = all_elements[::2]
+    batches = [
+            InterpolationBatch(
+                from_group_index=0,
+                from_element_indices=to_device(all_elements),
+                to_element_indices=to_device(all_elements),
+                result_unit_nodes=to_discr.groups[0].unit_nodes,
+                to_element_face=None),
+            InterpolationBatch(
+                from_group_index=0,
+                from_element_indices=to_device(some_elements),
+                to_element_indices=to_device(some_elements[::-1].copy()),
+                result_unit_nodes=to_discr.groups[0].unit_nodes,
+                to_element_face=None),
+            ]
+    conn = DirectDiscretizationConnection(from_discr, to_discr,
+            [DiscretizationConnectionElementGroup(batches)],
+            is_surjective=True)
+    reverse = L2ProjectionInverseDiscretizationConnection(conn)
+
+    # NOTE: the forward indices are np.intp, but the kernels get np.int32
+    from_element_indices, to_element_indices = \
+            reverse._batch_element_indices(actx, 0, 1)
+    assert from_element_indices.dtype == np.int32
+    assert to_element_indices.dtype == np.int32
+
+    result = reverse(x)
+    expected = project_on_host(actx, reverse, x)
+    for igrp, grp_expected in enumerate(expected):
+        grp_result = actx.to_numpy(result[igrp])
+        error = (
+                np.linalg.norm(grp_result - grp_expected, np.inf)
+                / np.linalg.norm(grp_expected, np.inf))
+        assert error < 1.0e-12
+
+
+def test_projection_target_coverage(actx_factory):
+    actx = actx_factory()
+
+    from meshmode.mesh.generation import generate_regular_rect_mesh
+    mesh = generate_regular_rect_mesh(
+            a=(0.0, 0.0), b=(1.0, 1.0),
+            nelements_per_axis=(2, 2),
+            order=1)
+
+    from meshmode.discretization import Discretization
+    from meshmode.discretization.poly_element import \
+            InterpolatoryQuadratureSimplexGroupFactory
+    discr = Discretization(actx, mesh,
+            InterpolatoryQuadratureSimplexGroupFactory(2))
+    grp = discr.groups[0]
+
+    from meshmode.discretization.connection.projection import (
+            _L2ProjectionConnectionBase, _ProjectionBatch)
+
+    class HandBuiltProjectionConnection(_L2ProjectionConnectionBase):
+        def __init__(self, batches):
+            super().__init__(discr, discr, is_surjective=False)
+            self.batches = batches
+
+        def _projection_batches(self, actx):
+            return [self.batches]
+
+    def make_batch(from_element_indices, to_element_indices):
+        return _ProjectionBatch(
+                from_group_index=0,
+                from_element_indices=from_element_indices,
+                to_element_indices=to_element_indices,
+                matrix=np.random.rand(grp.nunit_dofs, grp.nunit_dofs))
+
+    elements = np.arange(grp.nelements)
+    evens = elements[::2]
+    odds = elements[1::2]
+
+    cases = [
+            # disjoint and covering
+            ([make_batch(odds, evens), make_batch(evens, odds)], (True, True)),
+            # disjoint and not covering
+            ([make_batch(evens, odds[::-1])], (True, False)),
+            # overlapping and covering
+            ([make_batch(elements[::-1], elements), make_batch(evens, evens)],
+                (False, True)),
+            # overlapping and not covering
+            ([make_batch(odds, evens), make_batch(odds[::-1], evens)],
+                (False, False)),
+            # empty batch before a whole-group batch applied by einsum
+            ([make_batch(elements[:0], elements[:0]),
+                make_batch(elements, elements)],
+                (True, True)),
+            ]
+
+    from meshmode.dof_array import DOFArray
+    x = DOFArray(actx, (
+        actx.from_numpy(np.random.rand(grp.nelements, grp.nunit_dofs)),
+        ))
+
+    for batches, coverage in cases:
+        conn = HandBuiltProjectionConnection(batches)
+        assert conn._group_target_coverage(actx, 0) == coverage
+
+        # NOTE: the reference result is zero-initialized and accumulated
+        result = actx.to_numpy(conn(x)[0])
+        expected, = project_on_host(actx, conn, x)
+
+        error = (
+                np.linalg.norm(result - expected, np.inf)
+                / np.linalg.norm(expected, np.inf))
+        assert error < 1.0e-12
+
+
+@pytest.mark.parametrize("ndim", [2, 3])
+@pytest.mark.parametrize("dtype", [np.float64, np.float32, np.complex64])
+def test_reversed_tensor_product_connection(actx_factory, ndim, dtype):
+    actx = actx_factory()
+
+    from meshmode.discretization.connection import \
+            L2ProjectionInverseDiscretizationConnection
+    from meshmode.discretization.poly_element import \
+            GaussLegendreTensorProductGroupFactory
+    from meshmode.dof_array import DOFArray
+
+    dtype = np.dtype(dtype)
+    is_double = np.finfo(dtype).dtype == np.float64
+    scale = 1.0 + 1.0j if dtype.kind == "c" else 1.0
+
+    def to_dtype(ary):
+        return DOFArray(actx, tuple(
+            actx.from_numpy((scale * actx.to_numpy(subary)).astype(dtype))
+            for subary in ary))
+
+    def run(nelements, order):
+        discr = create_tensor_product_discretization(actx, ndim,
+                nelements=nelements,
+                order=order)
+        conn = create_refined_connection(actx, discr,
+                threshold=0.5,
+                group_factory_cls=GaussLegendreTensorProductGroupFactory)
+        reverse = L2ProjectionInverseDiscretizationConnection(conn,
+                use_sum_factorization=True)
+
+        # NOTE: all batches should be applied by sum factorization
+        for igrp, cgrp in enumerate(conn.groups):
+            for ibatch in range(len(cgrp.batches)):
+                assert reverse._batch_projection_factors(
+                        actx, igrp, ibatch, np.float64) is not None
+
+        # create test vector
+        from_nodes = thaw(actx, conn.from_discr.nodes())
+        to_nodes = thaw(actx, conn.to_discr.nodes())
+
+        from_x = 0
+        to_x = 0
+        for d in range(ndim):
+            from_x += actx.np.cos(from_nodes[d]) ** (d + 1)
+            to_x += actx.np.cos(to_nodes[d]) ** (d + 1)
+
+        from_interp = reverse(to_dtype(to_x))
+        assert from_interp.entry_dtype == dtype
+
+        # compare against the dense operators
+        dense_reverse = L2ProjectionInverseDiscretizationConnection(conn)
+        assert dense_reverse._batch_projection_factors(
+                actx, 0, 0, np.float64) is None
+
+        dense_interp = dense_reverse(to_dtype(to_x))
+
+        dense_error = (
+                actx.np.linalg.norm(from_interp - dense_interp, np.inf)
+                / actx.np.linalg.norm(dense_interp, np.inf))
+        assert dense_error < (1.0e-12 if is_double else 1.0e-4)
+
+        if not is_double:
+            # NOTE: single precision round-off dominates the projection
+            # error, so just compare against the double precision result
+            double_interp = reverse(scale * to_x)
+            error = (
+                    actx.np.linalg.norm(from_interp - double_interp, np.inf)
+                    / actx.np.linalg.norm(double_interp, np.inf))
+            assert error < 1.0e-4
+
+        return (1.0 / nelements,
+                actx.np.linalg.norm(from_interp - scale * from_x, np.inf)
+                / actx.np.linalg.norm(scale * from_x, np.inf))
+
+    from pytools.convergence import EOCRecorder
+    eoc = EOCRecorder()
+
+    if ndim == 2:
+        order = 5
+        mesh_sizes = [4, 6, 8, 12]
+    else:
+        order = 3
+        mesh_sizes = [2, 3, 4, 6]
+
+    if not is_double:
+        mesh_sizes = mesh_sizes[:2]
+
+    for n in mesh_sizes:
+        h, error = run(n, order)
+        eoc.add_data_point(h, error)
+
+    print(eoc)
+
+    if is_double:
+        assert eoc.order_estimate() > (order + 1 - 0.5)
+
+
 if __name__ == "__main__":
     import sys
     if len(sys.argv) > 1: